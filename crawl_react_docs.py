@@ -1,253 +1,333 @@
-import os
-import sys
-import json
-import asyncio
-import requests
-from typing import List, Dict, Any
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from urllib.parse import urlparse
-from dotenv import load_dotenv
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
-from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
-from openai import AsyncOpenAI
-from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter
-from supabase import create_client, Client
- 
-load_dotenv()
- 
-# Initialize OpenAI and Supabase clients
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
- 
-url_filter = URLPatternFilter(patterns=["*learn*", "*reference*"])
- 
-@dataclass
-class ProcessedChunk:
-    url: str
-    chunk_number: int
-    title: str
-    summary: str
-    content: str
-    metadata: Dict[str, Any]
-    embedding: List[float]
- 
-def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
-    """Split text into chunks, respecting code blocks and paragraphs."""
-    chunks = []
-    start = 0
-    text_length = len(text)
- 
-    while start < text_length:
-        # Calculate end position
-        end = start + chunk_size
- 
-        # If we're at the end of the text, just take what's left
-        if end >= text_length:
-            chunks.append(text[start:].strip())
-            break
- 
-        # Try to find a code block boundary first (```)
-        chunk = text[start:end]
-        code_block = chunk.rfind('```')
-        if code_block != -1 and code_block > chunk_size * 0.3:
-            end = start + code_block
- 
-        # If no code block, try to break at a paragraph
-        elif '\n\n' in chunk:
-            # Find the last paragraph break
-            last_break = chunk.rfind('\n\n')
-            if last_break > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_break
- 
-        # If no paragraph break, try to break at a sentence
-        elif '. ' in chunk:
-            # Find the last sentence break
-            last_period = chunk.rfind('. ')
-            if last_period > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_period + 1
- 
-        # Extract chunk and clean it up
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
- 
-        # Move start position for next chunk
-        start = max(start + 1, end)
- 
-    return chunks
- 
-async def get_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
-    """Extract title and summary using GPT-4."""
-    system_prompt = """You are an AI that extracts titles and summaries from documentation chunks.
-    Return a JSON object with 'title' and 'summary' keys.
-    For the title: If this seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
-    For the summary: Create a concise summary of the main points in this chunk.
-    Keep both title and summary concise but informative."""
-   
-    try:
-        response = await openai_client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content)
-    except Exception as e:
-        print(f"Error getting title and summary: {e}")
-        return {"title": "Error processing title", "summary": "Error processing summary"}
- 
-async def get_embedding(text: str) -> List[float]:
-    """Get embedding vector from OpenAI."""
-    try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
- 
-async def process_chunk(chunk: str, chunk_number: int, url: str) -> ProcessedChunk:
-    """Process a single chunk of text."""
-    # Get title and summary
-    extracted = await get_title_and_summary(chunk, url)
-   
-    # Get embedding
-    embedding = await get_embedding(chunk)
-   
-    # Create metadata
-    metadata = {
-        "source": "react_docs",
-        "chunk_size": len(chunk),
-        "crawled_at": datetime.now(timezone.utc).isoformat(),
-        "url_path": urlparse(url).path
-    }
-   
-    return ProcessedChunk(
-        url=url,
-        chunk_number=chunk_number,
-        title=extracted['title'],
-        summary=extracted['summary'],
-        content=chunk,  # Store the original chunk content
-        metadata=metadata,
-        embedding=embedding
-    )
- 
-async def insert_chunk(chunk: ProcessedChunk):
-    """Insert or update a processed chunk in Supabase."""
-    try:
-        data = {
-            "url": chunk.url,
-            "chunk_number": chunk.chunk_number,
-            "title": chunk.title,
-            "summary": chunk.summary,
-            "content": chunk.content,
-            "metadata": chunk.metadata,
-            "embedding": chunk.embedding
-        }
-       
-        # Use upsert instead of insert to overwrite existing data
-        result = supabase.table("react_pages").insert(data).execute()
-        print(f"Upserted chunk {chunk.chunk_number} for {chunk.url}")
-        return result
-    except Exception as e:
-        print(f"Error upserting chunk: {e}")
-        return None
- 
-async def process_and_store_document(url: str, markdown: str):
-    """Process a document and store its chunks in parallel."""
-    # Extra safety check - don't process empty content
-    if not markdown or markdown.strip() == "":
-        print(f"Skipping empty content for {url}")
-        return
-       
-    # Split into chunks
-    chunks = chunk_text(markdown)
-   
-    # Skip if no valid chunks
-    if not chunks:
-        print(f"No valid chunks found for {url}")
-        return
-   
-    # Process chunks in parallel
-    tasks = [
-        process_chunk(chunk, i, url)
-        for i, chunk in enumerate(chunks)
-    ]
-    processed_chunks = await asyncio.gather(*tasks)
-   
-    # Store chunks in parallel
-    insert_tasks = [
-        insert_chunk(chunk)
-        for chunk in processed_chunks
-    ]
-    await asyncio.gather(*insert_tasks)
- 
-async def crawl_react_docs(url: str, max_depth: int = 3):
-    """Crawl the React documentation starting from the given URL."""
-   
-    # Create a filter chain with URL patterns
-    # filter_chain = FilterChain([
-    #     URLPatternFilter(patterns=[
-    #         "*blog*",
-    #         "*core*",
-    #         "*advanced*",
-    #         "*api*",
-    #         "*extraction*"
-    #     ])
-    # ])
-   
-    config = CrawlerRunConfig(
-        deep_crawl_strategy=BFSDeepCrawlStrategy(
-            max_depth=2,
-            include_external=False  # Apply the filter chain here
-        ),
-        scraping_strategy=LXMLWebScrapingStrategy(),
-        verbose=True
-    )
- 
-    async with AsyncWebCrawler() as crawler:
-        results = await crawler.arun(
-            url=url,
-            config=config
-        )
-       
-        # Rest of your function remains the same
-        if not results:
-            print(f"No results returned for: {url}")
-            return
-           
-        print(f"Crawled {len(results)} pages starting from {url}")
-       
-        # Process each result in the list
-        for result in results:
-            # Check for 404 explicitly, along with other failures
-            if hasattr(result, 'status_code') and result.status_code == 404:
-                page_url = getattr(result, 'url', 'unknown URL')
-                print(f"Skipping 404 Not Found: {page_url}")
-                continue
-               
-            if hasattr(result, 'success') and result.success:
-                page_url = getattr(result, 'url', url)
-                print(f"Successfully crawled: {page_url}")
-                await process_and_store_document(page_url, result.markdown)
-            else:
-                error_msg = getattr(result, 'error_message', 'Unknown error')
-                status_code = getattr(result, 'status_code', 'unknown status')
-                page_url = getattr(result, 'url', 'unknown URL')
-                print(f"Failed to crawl: {page_url} - Status: {status_code} - Error: {error_msg}")
- 
-async def main():
-    start_url = "https://react.dev/"  # Starting point
-    await crawl_react_docs(start_url)
- 
-if __name__ == "__main__":
+import os
+import re
+import sys
+import json
+import bisect
+import asyncio
+import httpx
+import requests
+from typing import List, Dict, Any
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
+from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
+from openai import AsyncOpenAI
+from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter
+from supabase import create_client, Client
+ 
+load_dotenv()
+ 
+# Initialize OpenAI and Supabase clients. HTTP/2 multiplexes the crawler's
+# concurrent title and embedding requests over one warm TLS connection pool.
+_http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=30,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=64)
+)
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http_client)
+supabase: Client = create_client(
+    os.getenv("SUPABASE_URL"),
+    os.getenv("SUPABASE_SERVICE_KEY")
+)
+ 
+url_filter = URLPatternFilter(patterns=["*learn*", "*reference*"])
+
+# Cap in-flight OpenAI requests; unbounded gather piles up hundreds of pending
+# tasks and trips the rate limiter on large documents
+_OAI_SEM = asyncio.Semaphore(int(os.getenv("OAI_CONCURRENCY", "8")))
+ 
+@dataclass
+class ProcessedChunk:
+    url: str
+    chunk_number: int
+    title: str
+    summary: str
+    content: str
+    metadata: Dict[str, Any]
+    embedding: List[float]
+ 
+def _trim_slice(text: str, start: int, end: int) -> str:
+    """Slice text[start:end] with surrounding whitespace trimmed by index.
+
+    Equivalent to text[start:end].strip() but allocates one string per chunk
+    instead of the slice plus a stripped copy. Chunk boundaries usually land on
+    a delimiter, so these loops run a handful of iterations at most.
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return text[start:end]
+
+# All chunk boundary candidates - code fences, paragraph breaks, sentence
+# breaks - found in one C-level regex scan instead of per-window rfind passes
+_BOUNDARY_RE = re.compile(r'```|\n\n|\. ')
+
+def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
+    """Split text into chunks, respecting code blocks and paragraphs."""
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    # Enumerate every candidate boundary once up front
+    fences: List[int] = []
+    paragraphs: List[int] = []
+    sentences: List[int] = []
+    for match in _BOUNDARY_RE.finditer(text):
+        token = match.group()
+        if token == '```':
+            fences.append(match.start())
+        elif token == '\n\n':
+            paragraphs.append(match.start())
+        else:
+            sentences.append(match.start())
+
+    def last_in(positions: List[int], lo: int, hi: int) -> int:
+        """Largest recorded position in [lo, hi), or -1."""
+        i = bisect.bisect_left(positions, hi) - 1
+        if i >= 0 and positions[i] >= lo:
+            return positions[i]
+        return -1
+
+    while start < text_length:
+        # Calculate end position
+        end = start + chunk_size
+
+        # If we're at the end of the text, just take what's left
+        if end >= text_length:
+            chunk = _trim_slice(text, start, text_length)
+            if chunk:
+                chunks.append(chunk)
+            break
+
+        # Only break past 30% of chunk_size
+        min_end = start + int(chunk_size * 0.3)
+
+        # Try to find a code block boundary first (```). The whole delimiter
+        # must fit inside the window, hence the end - len + 1 upper bounds.
+        code_block = last_in(fences, min_end, end - 2)
+        if code_block != -1:
+            end = code_block
+        else:
+            # If no code block, try to break at a paragraph
+            last_break = last_in(paragraphs, min_end, end - 1)
+            if last_break != -1:
+                end = last_break
+            else:
+                # If no paragraph break, try to break at a sentence
+                last_period = last_in(sentences, min_end, end - 1)
+                if last_period != -1:
+                    end = last_period + 1
+
+        # Extract chunk and clean it up
+        chunk = _trim_slice(text, start, end)
+        if chunk:
+            chunks.append(chunk)
+
+        # Move start position for next chunk
+        start = max(start + 1, end)
+
+    return chunks
+
+# Title/summary results keyed by chunk hash - identical fragments (nav blocks,
+# shared footers) recur across pages, so don't pay the API call twice
+_title_cache: Dict[int, Dict[str, str]] = {}
+
+async def get_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
+    """Extract title and summary using GPT-4."""
+    # Fast path: tiny chunks don't warrant a network round trip - use the
+    # first line as the title and the head of the chunk as the summary
+    if len(chunk) < 400:
+        first_line = chunk.split('\n', 1)[0].lstrip('# ')
+        return {"title": first_line[:80] or "Untitled", "summary": chunk[:200]}
+
+    cache_key = hash(chunk)
+    cached = _title_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    system_prompt = """You are an AI that extracts titles and summaries from documentation chunks.
+    Return a JSON object with 'title' and 'summary' keys.
+    For the title: If this seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
+    For the summary: Create a concise summary of the main points in this chunk.
+    Keep both title and summary concise but informative."""
+   
+    try:
+        async with _OAI_SEM:
+            response = await openai_client.chat.completions.create(
+                model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
+                ],
+                response_format={ "type": "json_object" }
+            )
+        extracted = json.loads(response.choices[0].message.content)
+        _title_cache[cache_key] = extracted
+        return extracted
+    except Exception as e:
+        print(f"Error getting title and summary: {e}")
+        return {"title": "Error processing title", "summary": "Error processing summary"}
+ 
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embedding vectors from OpenAI for a batch of texts in one request."""
+    try:
+        async with _OAI_SEM:
+            response = await openai_client.embeddings.create(
+                model="text-embedding-3-small",
+                input=texts
+            )
+        return [d.embedding for d in response.data]
+    except Exception as e:
+        print(f"Error getting embeddings: {e}")
+        return [[0] * 1536 for _ in texts]  # Return zero vectors on error
+
+def process_chunk(chunk: str, chunk_number: int, url: str, base_metadata: Dict[str, Any], extracted: Dict[str, str], embedding: List[float]) -> ProcessedChunk:
+    """Build a ProcessedChunk from its pre-fetched title/summary and embedding.
+
+    base_metadata carries the document-scoped fields (source, crawled_at,
+    url_path), computed once by the caller; only chunk_size varies per chunk.
+    """
+    # Create metadata
+    metadata = {**base_metadata, "chunk_size": len(chunk)}
+   
+    return ProcessedChunk(
+        url=url,
+        chunk_number=chunk_number,
+        title=extracted['title'],
+        summary=extracted['summary'],
+        content=chunk,  # Store the original chunk content
+        metadata=metadata,
+        embedding=embedding
+    )
+ 
+def insert_chunks(chunks: List[ProcessedChunk]):
+    """Insert a document's processed chunks into Supabase in one request.
+
+    The supabase client is synchronous, so callers on the event loop should
+    run this via asyncio.to_thread.
+    """
+    try:
+        rows = [
+            {
+                "url": chunk.url,
+                "chunk_number": chunk.chunk_number,
+                "title": chunk.title,
+                "summary": chunk.summary,
+                "content": chunk.content,
+                "metadata": chunk.metadata,
+                "embedding": chunk.embedding
+            }
+            for chunk in chunks
+        ]
+
+        # A single insert with a list of rows writes the whole batch in one round trip
+        result = supabase.table("react_pages").insert(rows).execute()
+        print(f"Inserted {len(rows)} chunks for {chunks[0].url}")
+        return result
+    except Exception as e:
+        print(f"Error inserting chunks: {e}")
+        return None
+
+async def process_and_store_document(url: str, markdown: str):
+    """Process a document and store its chunks in parallel."""
+    # Extra safety check - don't process empty content
+    if not markdown or markdown.strip() == "":
+        print(f"Skipping empty content for {url}")
+        return
+       
+    # Split into chunks
+    chunks = chunk_text(markdown)
+   
+    # Skip if no valid chunks
+    if not chunks:
+        print(f"No valid chunks found for {url}")
+        return
+   
+    # Fetch all titles concurrently, and all embeddings in a single batched
+    # request - one embeddings round trip per document instead of one per chunk
+    title_tasks = [get_title_and_summary(chunk, url) for chunk in chunks]
+    extracted_list, embeddings = await asyncio.gather(
+        asyncio.gather(*title_tasks),
+        get_embeddings(chunks)
+    )
+
+    # Shared metadata fields, computed once for the whole document
+    base_metadata = {
+        "source": "react_docs",
+        "crawled_at": datetime.now(timezone.utc).isoformat(),
+        "url_path": urlparse(url).path
+    }
+
+    processed_chunks = [
+        process_chunk(chunk, i, url, base_metadata, extracted, embedding)
+        for i, (chunk, extracted, embedding) in enumerate(zip(chunks, extracted_list, embeddings))
+    ]
+   
+    # Store all chunks with one batched insert, off the event loop so other
+    # documents' OpenAI calls keep flowing while the DB write runs
+    await asyncio.to_thread(insert_chunks, processed_chunks)
+ 
+async def crawl_react_docs(url: str, max_depth: int = 3):
+    """Crawl the React documentation starting from the given URL."""
+   
+    # Create a filter chain with URL patterns
+    # filter_chain = FilterChain([
+    #     URLPatternFilter(patterns=[
+    #         "*blog*",
+    #         "*core*",
+    #         "*advanced*",
+    #         "*api*",
+    #         "*extraction*"
+    #     ])
+    # ])
+   
+    config = CrawlerRunConfig(
+        deep_crawl_strategy=BFSDeepCrawlStrategy(
+            max_depth=2,
+            include_external=False  # Apply the filter chain here
+        ),
+        scraping_strategy=LXMLWebScrapingStrategy(),
+        verbose=True
+    )
+ 
+    async with AsyncWebCrawler() as crawler:
+        results = await crawler.arun(
+            url=url,
+            config=config
+        )
+       
+        # Rest of your function remains the same
+        if not results:
+            print(f"No results returned for: {url}")
+            return
+           
+        print(f"Crawled {len(results)} pages starting from {url}")
+       
+        # Process each result in the list
+        for result in results:
+            # Check for 404 explicitly, along with other failures
+            if hasattr(result, 'status_code') and result.status_code == 404:
+                page_url = getattr(result, 'url', 'unknown URL')
+                print(f"Skipping 404 Not Found: {page_url}")
+                continue
+               
+            if hasattr(result, 'success') and result.success:
+                page_url = getattr(result, 'url', url)
+                print(f"Successfully crawled: {page_url}")
+                await process_and_store_document(page_url, result.markdown)
+            else:
+                error_msg = getattr(result, 'error_message', 'Unknown error')
+                status_code = getattr(result, 'status_code', 'unknown status')
+                page_url = getattr(result, 'url', 'unknown URL')
+                print(f"Failed to crawl: {page_url} - Status: {status_code} - Error: {error_msg}")
+ 
+async def main():
+    start_url = "https://react.dev/"  # Starting point
+    await crawl_react_docs(start_url)
+ 
+if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
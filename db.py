@@ -0,0 +1,21 @@
+from functools import lru_cache
+from dotenv import load_dotenv
+from supabase import Client
+import os
+
+# Load environment variables
+load_dotenv()
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Return the process-wide Supabase client.
+
+    graph.py and streamlit_ui.py previously each built their own client, so
+    one Streamlit process held two connection pools. The lru_cache makes this
+    a singleton: the first caller creates the client, everyone else shares it
+    (and its pool).
+    """
+    return Client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
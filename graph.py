@@ -1,363 +1,565 @@
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai import Agent, RunContext
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from typing import TypedDict, Annotated, List, Any, Literal, Dict, get_type_hints
-from langgraph.config import get_stream_writer
-from langgraph.types import interrupt
-from dotenv import load_dotenv
-from openai import OpenAI, AsyncOpenAI
-from supabase import Client
-import logfire
-import os
-import json
-
-# Import the message classes from Pydantic AI
-from pydantic_ai.messages import (
-    ModelMessage,
-    ModelMessagesTypeAdapter
-)
-
-from app_coder import app_coder, AppCoderDeps, list_documentation_pages_helper
-
-# Load environment variables
-load_dotenv()
-
-# Configure logfire to suppress warnings
-logfire.configure(send_to_logfire='never')
-
-# Configure API clients for both OpenAI and Deepseek
-openai_base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
-deepseek_base_url = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
-
-# Initialize separate clients for each API
-openai_client = AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url=openai_base_url
-)
-
-# Deepseek client - we'll use the sync version for custom handling
-deepseek_client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url=deepseek_base_url
-)
-
-# Get model names from environment
-reasoner_llm_model = os.getenv('REASONER_MODEL', 'deepseek-reasoner')
-primary_llm_model = os.getenv('PRIMARY_MODEL', 'gpt-4o-mini')
-
-# Set environment variables for OpenAI client
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["OPENAI_BASE_URL"] = openai_base_url
-
-# Create the agents with appropriate models
-# For the reasoner, we'll create a custom function to use deepseek-reasoner directly
-# rather than through the OpenAIModel abstraction, due to its special fields
-
-router_agent = Agent(  
-    OpenAIModel(primary_llm_model),
-    system_prompt='Your job is to route the user message either to the end of the conversation or to continue coding the cross-platform application.',  
-)
-
-end_conversation_agent = Agent(  
-    OpenAIModel(primary_llm_model),
-    system_prompt='Your job is to end a conversation by providing a summary of the created app components, installation instructions, and a friendly goodbye.',  
-)
-
-platform_selection_agent = Agent(
-    OpenAIModel(primary_llm_model),
-    system_prompt='''Your job is to determine which platforms the user wants to target.
-Options are: web (React), desktop (Electron), mobile (NativeScript), and server (Node.js).
-Respond with a comma-separated list of platforms the user wants code for.'''
-)
-
-# Connect to Supabase
-supabase: Client = Client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
-
-# Define state schema
-class CodeperState(TypedDict):
-    latest_user_message: str
-    messages: Annotated[List[bytes], lambda x, y: x + y]
-    scope: str
-    platforms: List[str]
-
-# Function to ensure all required state keys exist with defaults
-def ensure_state_has_defaults(state):
-    if not isinstance(state, dict):
-        state = {}
-    
-    if 'latest_user_message' not in state:
-        state['latest_user_message'] = ""
-    
-    if 'messages' not in state:
-        state['messages'] = []
-    
-    if 'scope' not in state:
-        state['scope'] = ""
-    
-    if 'platforms' not in state:
-        state['platforms'] = []
-    
-    return state
-
-# Custom function to call the deepseek-reasoner model directly
-async def call_deepseek_reasoner(prompt):
-    """
-    Custom function to call the deepseek-reasoner model which has special output format.
-    
-    Args:
-        prompt: The prompt text
-        
-    Returns:
-        The final response content from the model
-    """
-    try:
-        print(f"Calling deepseek-reasoner with prompt: {prompt[:100]}...")
-        
-        # Call deepseek-reasoner with special handling
-        messages = [{"role": "user", "content": prompt}]
-        
-        # Use sync client since Pydantic-AI expects string output
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-reasoner",
-            messages=messages,
-            max_tokens=4000  # Limit final response length (not reasoning chain)
-        )
-        
-        # Get both reasoning chain and final content
-        reasoning = response.choices[0].message.reasoning_content
-        content = response.choices[0].message.content
-        
-        print(f"Received reasoning ({len(reasoning)} chars) and content ({len(content)} chars)")
-        
-        # Save the reasoning to a file for inspection
-        os.makedirs("workbench", exist_ok=True)
-        with open(os.path.join("workbench", "reasoning_chain.md"), "w", encoding="utf-8") as f:
-            f.write(f"# Reasoning Chain\n\n{reasoning}\n\n# Final Response\n\n{content}")
-            
-        # Return the final content for the scope
-        return content
-        
-    except Exception as e:
-        print(f"Error calling deepseek-reasoner: {str(e)}")
-        # Fallback to a default response
-        return f"Error generating scope: {str(e)}"
-
-# Determine which platforms to target
-async def select_platforms(state: CodeperState):
-    # Ensure state has all required keys
-    state = ensure_state_has_defaults(state)
-    
-    prompt = f"""
-    The user is requesting an app with this description:
-    
-    {state['latest_user_message']}
-    
-    Determine which platforms should be targeted for this app. 
-    Respond with just a comma-separated list of the platforms to target, selected from:
-    - react (for web)
-    - electron (for desktop)
-    - nativescript (for mobile)
-    - nodejs (for server)
-    
-    For example: "react,electron,nodejs"
-    """
-    
-    result = await platform_selection_agent.run(prompt)
-    platforms_str = result.data.strip()
-    platforms = [p.strip().lower() for p in platforms_str.split(',')]
-    
-    # Validate platforms
-    valid_platforms = ['react', 'electron', 'nativescript', 'nodejs']
-    platforms = [p for p in platforms if p in valid_platforms]
-    
-    # Make sure we have at least one platform
-    if not platforms:
-        platforms = ['react']  # Default to React if no valid platform specified
-        
-    return {"platforms": platforms}
-
-# Scope Definition Node with Deepseek Reasoner
-async def define_scope_with_reasoner(state: CodeperState):
-    # Ensure state has all required keys
-    state = ensure_state_has_defaults(state)
-    
-    # First, get the documentation pages so the reasoner can decide which ones are necessary
-    try:
-        documentation_pages = await list_documentation_pages_helper(supabase)
-        documentation_pages_str = "\n".join(documentation_pages)
-    except Exception as e:
-        print(f"Error retrieving documentation pages: {str(e)}")
-        documentation_pages_str = "Documentation pages currently unavailable."
-
-    platforms_str = ", ".join(state['platforms'])
-
-    # Then, prepare the prompt for the reasoner
-    prompt = f"""
-    User App Request: {state['latest_user_message']}
-    
-    Target Platforms: {platforms_str}
-    
-    Create a detailed scope document for the cross-platform application including:
-    - Architecture diagram
-    - Core components for each platform ({platforms_str})
-    - Shared components and logic
-    - External dependencies and APIs
-    - Data flow between components
-    - User interface mockups
-    
-    Also, based on these documentation pages available:
-
-    {documentation_pages_str}
-
-    Include a list of documentation pages that are relevant to creating this app in the scope document,
-    specifically focusing on the selected platforms: {platforms_str}.
-    """
-
-    # Call deepseek-reasoner directly with custom handling
-    scope = await call_deepseek_reasoner(prompt)
-
-    # Save the scope to a file
-    scope_path = os.path.join("workbench", "scope.md")
-    os.makedirs("workbench", exist_ok=True)
-
-    with open(scope_path, "w", encoding="utf-8") as f:
-        f.write(scope)
-    
-    return {"scope": scope}
-
-# Coding Node with Feedback Handling
-async def coder_agent(state: CodeperState, writer):
-    # Ensure state has all required keys
-    state = ensure_state_has_defaults(state)
-    
-    # Prepare dependencies
-    deps = AppCoderDeps(
-        supabase=supabase,
-        openai_client=openai_client,  # Use OpenAI client for coding
-        reasoner_output=state['scope'],
-        platforms=state['platforms']
-    )
-
-    # Get the message history into the format for Pydantic AI
-    message_history: list[ModelMessage] = []
-    for message_row in state.get('messages', []):
-        try:
-            message_history.extend(ModelMessagesTypeAdapter.validate_json(message_row))
-        except Exception as e:
-            print(f"Error processing message: {e}")
-            continue
-
-    # Run the agent in a stream
-    async with app_coder.run_stream(
-        state['latest_user_message'],
-        deps=deps,
-        message_history=message_history
-    ) as result:
-        # Stream partial text as it arrives
-        async for chunk in result.stream_text(delta=True):
-            writer(chunk)
-
-    return {"messages": [result.new_messages_json()]}
-
-# Modified implementation to avoid the interrupt error
-def get_next_user_message(state: CodeperState):
-    """
-    This is a placeholder for the interrupt node.
-    In LangGraph, this is a special node that will pause execution
-    and wait for the next user input.
-    
-    The actual interrupt happens in the streamlit_ui.py
-    when it calls codeper_flow.astream with Command(resume=user_input)
-    """
-    # We don't call interrupt() here, as that's handled by the UI
-    # Just return the state as-is
-    return state
-
-# Determine if the user is finished creating their app or not
-async def route_user_message(state: CodeperState):
-    # Ensure state has all required keys
-    state = ensure_state_has_defaults(state)
-    
-    prompt = f"""
-    The user has sent a message: 
-    
-    {state['latest_user_message']}
-
-    If the user wants to end the conversation or indicates they're done with the application, respond with just the text "finish_conversation".
-    If the user wants to continue coding the app, respond with just the text "coder_agent".
-    """
-
-    result = await router_agent.run(prompt)
-    next_action = result.data.strip().lower()
-
-    if next_action == "finish_conversation":
-        return "finish_conversation"
-    else:
-        return "coder_agent"
-
-# End of conversation agent to give instructions for executing the app
-async def finish_conversation(state: CodeperState, writer):
-    # Ensure state has all required keys
-    state = ensure_state_has_defaults(state)
-    
-    # Get the message history into the format for Pydantic AI
-    message_history: list[ModelMessage] = []
-    for message_row in state.get('messages', []):
-        try:
-            message_history.extend(ModelMessagesTypeAdapter.validate_json(message_row))
-        except Exception as e:
-            print(f"Error processing message: {e}")
-            continue
-
-    platforms_str = ", ".join(state['platforms'])
-    
-    # Custom prompt for the end conversation agent
-    prompt = f"""
-    The user has completed coding their application for the following platforms: {platforms_str}.
-    
-    Summarize what was created, provide instructions for running the application on each platform,
-    and offer a friendly goodbye.
-    
-    Their original request was: {state['latest_user_message']}
-    """
-
-    # Run the agent in a stream
-    async with end_conversation_agent.run_stream(
-        prompt,
-        message_history=message_history
-    ) as result:
-        # Stream partial text as it arrives
-        async for chunk in result.stream_text(delta=True):
-            writer(chunk)
-
-    return {"messages": [result.new_messages_json()]}        
-
-# Build workflow
-builder = StateGraph(CodeperState)
-
-# Add nodes
-builder.add_node("select_platforms", select_platforms)
-builder.add_node("define_scope_with_reasoner", define_scope_with_reasoner)
-builder.add_node("coder_agent", coder_agent)
-builder.add_node("get_next_user_message", get_next_user_message)
-builder.add_node("finish_conversation", finish_conversation)
-
-# Set edges
-builder.add_edge(START, "select_platforms")
-builder.add_edge("select_platforms", "define_scope_with_reasoner")
-builder.add_edge("define_scope_with_reasoner", "coder_agent")
-builder.add_edge("coder_agent", "get_next_user_message")
-builder.add_conditional_edges(
-    "get_next_user_message",
-    route_user_message,
-    {"coder_agent": "coder_agent", "finish_conversation": "finish_conversation"}
-)
-builder.add_edge("finish_conversation", END)
-
-# Configure persistence
-memory = MemorySaver()
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai import Agent, RunContext
+from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from typing import TypedDict, Annotated, List, Any, Literal, Dict, get_type_hints
+from langgraph.config import get_stream_writer
+from langgraph.types import interrupt
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from supabase import Client
+import aiofiles
+import aiosqlite
+import asyncio
+import hashlib
+import httpx
+import logfire
+import os
+import re
+import time
+import json
+
+# Import the message classes from Pydantic AI
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    UserPromptPart
+)
+
+from app_coder import app_coder, AppCoderDeps, list_documentation_pages_helper
+from db import get_supabase
+
+# Load environment variables - guarded so streamlit_ui.py and graph.py don't
+# each re-parse the .env file when both are imported in one process
+if not os.getenv("_ENV_LOADED"):
+    load_dotenv()
+    os.environ["_ENV_LOADED"] = "1"
+
+# Configure logfire to suppress warnings
+logfire.configure(send_to_logfire='never')
+
+# Configure API clients for both OpenAI and Deepseek
+openai_base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+deepseek_base_url = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
+
+# Initialize separate clients for each API
+# Use a persistent HTTP/2 connection pool so embedding and completion requests
+# reuse warm TLS connections instead of paying a cold handshake after idle
+openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=openai_base_url,
+    http_client=httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=120)
+    )
+)
+
+# Deepseek client - async so the long reasoning call doesn't block the loop
+deepseek_client = AsyncOpenAI(
+    api_key=os.getenv("DEEPSEEK_API_KEY"),
+    base_url=deepseek_base_url
+)
+
+# Get model names from environment
+reasoner_llm_model = os.getenv('REASONER_MODEL', 'deepseek-reasoner')
+primary_llm_model = os.getenv('PRIMARY_MODEL', 'gpt-4o-mini')
+
+# Set environment variables for OpenAI client
+os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+os.environ["OPENAI_BASE_URL"] = openai_base_url
+
+# Create the agents with appropriate models
+# For the reasoner, we'll create a custom function to use deepseek-reasoner directly
+# rather than through the OpenAIModel abstraction, due to its special fields
+
+router_agent = Agent(  
+    OpenAIModel(primary_llm_model),
+    system_prompt='Your job is to route the user message either to the end of the conversation or to continue coding the cross-platform application.',  
+)
+
+end_conversation_agent = Agent(  
+    OpenAIModel(primary_llm_model),
+    system_prompt='Your job is to end a conversation by providing a summary of the created app components, installation instructions, and a friendly goodbye.',  
+)
+
+scope_agent = Agent(
+    OpenAIModel(primary_llm_model),
+    system_prompt='Your job is to write a concise scope document for a simple application: architecture, core components, data flow, and the documentation pages relevant to building it.',
+)
+
+platform_selection_agent = Agent(
+    OpenAIModel(primary_llm_model),
+    system_prompt='''Your job is to determine which platforms the user wants to target.
+Options are: web (React), desktop (Electron), mobile (NativeScript), and server (Node.js).
+Respond with a comma-separated list of platforms the user wants code for.'''
+)
+
+# Node prompt templates, built once at import. Nodes fill them with
+# format_map instead of re-allocating the full template per call.
+_PLATFORM_SELECTION_PROMPT = """
+    The user is requesting an app with this description:
+    
+    {msg}
+    
+    Determine which platforms should be targeted for this app. 
+    Respond with just a comma-separated list of the platforms to target, selected from:
+    - react (for web)
+    - electron (for desktop)
+    - nativescript (for mobile)
+    - nodejs (for server)
+    
+    For example: "react,electron,nodejs"
+    """
+
+# Static instructions lead and the volatile user request comes last: provider
+# KV/prompt caches only hit on byte-identical prefixes, so turn 2+ reuses the
+# instruction and documentation prefix instead of re-prefilling it
+_SCOPE_PROMPT = """
+    Create a detailed scope document for the cross-platform application including:
+    - Architecture diagram
+    - Core components for each target platform
+    - Shared components and logic
+    - External dependencies and APIs
+    - Data flow between components
+    - User interface mockups
+    
+    Base the scope on these documentation pages available:
+
+    {docs}
+
+    Include a list of documentation pages that are relevant to creating this app in the scope document,
+    specifically focusing on the selected platforms.
+
+    ---
+    User App Request: {msg}
+    
+    Target Platforms: {platforms}
+    """
+
+_ROUTER_PROMPT = """
+    If the user wants to end the conversation or indicates they're done with the application, respond with just the text "finish_conversation".
+    If the user wants to continue coding the app, respond with just the text "coder_agent".
+
+    The user has sent this message: 
+    
+    {msg}
+    """
+
+_FINISH_PROMPT = """
+    The user has completed coding their cross-platform application.
+    
+    Summarize what was created, provide instructions for running the application on each platform,
+    and offer a friendly goodbye.
+    
+    ---
+    Target platforms: {platforms}
+    Their original request was: {msg}
+    """
+
+# Connect to Supabase (shared process-wide client)
+supabase: Client = get_supabase()
+
+# Documentation page listing changes rarely; cache it (and its joined string
+# form) for a few minutes so each scope call skips the Supabase round trip
+_DOCS_CACHE_TTL = 300  # seconds
+_docs_cache = {"ts": 0.0, "pages": None, "joined": ""}
+_docs_cache_lock = asyncio.Lock()
+
+async def get_documentation_pages_cached(ttl: float = _DOCS_CACHE_TTL) -> str:
+    """Return the newline-joined documentation page list, cached with a TTL."""
+    if _docs_cache["pages"] is not None and time.time() - _docs_cache["ts"] < ttl:
+        return _docs_cache["joined"]
+    async with _docs_cache_lock:
+        # Re-check under the lock so concurrent cold calls fetch only once
+        if _docs_cache["pages"] is not None and time.time() - _docs_cache["ts"] < ttl:
+            return _docs_cache["joined"]
+        pages = await list_documentation_pages_helper(supabase)
+        _docs_cache["pages"] = pages
+        _docs_cache["joined"] = "\n".join(pages)
+        _docs_cache["ts"] = time.time()
+    return _docs_cache["joined"]
+
+# Messages reducer: nodes append raw new_messages_json() rows; each row is
+# parsed into ModelMessage objects exactly once here, instead of every node
+# re-parsing the whole history on every turn
+_MAX_MESSAGES = 40  # cap per-checkpoint payload; only recent context matters
+
+def _is_exchange_start(message: ModelMessage) -> bool:
+    """True for the ModelRequest that opens a user exchange."""
+    return isinstance(message, ModelRequest) and any(
+        isinstance(part, UserPromptPart) for part in message.parts
+    )
+
+def _merge_messages(existing, new_rows):
+    merged = list(existing or [])
+    for row in new_rows or []:
+        if isinstance(row, (bytes, str)):
+            try:
+                merged.extend(ModelMessagesTypeAdapter.validate_json(row))
+            except Exception as e:
+                print(f"Error processing message: {e}")
+        else:
+            merged.append(row)
+    # Keep the history bounded so checkpoint size doesn't grow without limit.
+    # Only drop whole user exchanges from the front - a bare slice can cut
+    # between a tool call and its return, which the model API rejects - and
+    # always keep the first exchange, which carries the original request.
+    if len(merged) > _MAX_MESSAGES:
+        starts = [i for i, m in enumerate(merged) if _is_exchange_start(m)]
+        if len(starts) > 2:
+            head_end = starts[1]  # first exchange spans [0, starts[1])
+            budget = _MAX_MESSAGES - head_end
+            tail_start = next(
+                (s for s in starts[1:] if len(merged) - s <= budget),
+                starts[-1]  # nothing fits: keep at least the last exchange
+            )
+            merged = merged[:head_end] + merged[tail_start:]
+    return merged
+
+# Define state schema
+class CodeperState(TypedDict):
+    latest_user_message: str
+    messages: Annotated[List[ModelMessage], _merge_messages]
+    scope: str
+    platforms: List[str]
+
+# Custom function to call the deepseek-reasoner model directly
+async def call_deepseek_reasoner(prompt, writer=None):
+    """
+    Custom function to call the deepseek-reasoner model which has special output format.
+    
+    Args:
+        prompt: The prompt text
+        writer: Optional stream writer; receives final-content deltas as they arrive
+        
+    Returns:
+        The final response content from the model
+    """
+    try:
+        print(f"Calling deepseek-reasoner with prompt: {prompt[:100]}...")
+        
+        # Call deepseek-reasoner with special handling
+        messages = [{"role": "user", "content": prompt}]
+        
+        # Stream the response so the first tokens arrive in ~1s instead of
+        # waiting for the whole reasoning chain to finish server-side
+        stream = await deepseek_client.chat.completions.create(
+            model="deepseek-reasoner",
+            messages=messages,
+            max_tokens=4000,  # Limit final response length (not reasoning chain)
+            stream=True
+        )
+        
+        # Accumulate the reasoning chain and final content separately
+        reasoning_parts = []
+        content_parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta
+            if getattr(delta, 'reasoning_content', None):
+                reasoning_parts.append(delta.reasoning_content)
+            elif delta.content:
+                content_parts.append(delta.content)
+                if writer:
+                    writer(delta.content)
+        reasoning = "".join(reasoning_parts)
+        content = "".join(content_parts)
+        
+        print(f"Received reasoning ({len(reasoning)} chars) and content ({len(content)} chars)")
+        
+        # Save the reasoning to a file for inspection, off the event loop.
+        # workbench/ is created once at module import, so no makedirs here.
+        async with aiofiles.open(os.path.join("workbench", "reasoning_chain.md"), "w", encoding="utf-8") as f:
+            await f.write(f"# Reasoning Chain\n\n{reasoning}\n\n# Final Response\n\n{content}")
+            
+        # Return the final content for the scope
+        return content
+        
+    except Exception as e:
+        print(f"Error calling deepseek-reasoner: {str(e)}")
+        # Propagate instead of returning error text: callers cache the result,
+        # and a transient failure must never be persisted as model output
+        raise
+
+# Prompt-to-response disk cache. Identical scope and selection prompts are
+# common while iterating on an app; a repeat becomes a file read instead of a
+# multi-second LLM call.
+_LLM_CACHE_DIR = os.path.join("workbench", ".llm_cache")
+
+async def cached_llm_call(prompt: str, fn, use_cache: bool = True) -> str:
+    """Run the async fn(prompt), caching its string result on disk by prompt hash."""
+    if not use_cache:
+        return await fn(prompt)
+
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    cache_path = os.path.join(_LLM_CACHE_DIR, f"{key}.txt")
+    try:
+        async with aiofiles.open(cache_path, "r", encoding="utf-8") as f:
+            return await f.read()
+    except FileNotFoundError:
+        pass
+
+    result = await fn(prompt)
+
+    def _store():
+        # Write-then-rename so a crashed run never leaves a torn cache entry
+        os.makedirs(_LLM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(result)
+        os.replace(tmp_path, cache_path)
+
+    await asyncio.to_thread(_store)
+    return result
+
+# Background prefetch of the documentation listing, started while the platform
+# selection LLM call is in flight. Kept module-level rather than in graph
+# state because the checkpointer serializes state values.
+_docs_prefetch_task = None
+
+# Determine which platforms to target
+async def select_platforms(state: CodeperState):
+    # Start fetching the documentation listing now; define_scope_with_reasoner
+    # needs it and it is independent of the platform selection result
+    global _docs_prefetch_task
+    _docs_prefetch_task = asyncio.create_task(get_documentation_pages_cached())
+    
+    prompt = _PLATFORM_SELECTION_PROMPT.format_map({"msg": state['latest_user_message']})
+    
+    async def _select(p):
+        result = await platform_selection_agent.run(p)
+        return result.data
+
+    platforms_str = (await cached_llm_call(prompt, _select)).strip()
+    platforms = [p.strip().lower() for p in platforms_str.split(',')]
+    
+    # Validate platforms
+    valid_platforms = ['react', 'electron', 'nativescript', 'nodejs']
+    platforms = [p for p in platforms if p in valid_platforms]
+    
+    # Make sure we have at least one platform
+    if not platforms:
+        platforms = ['react']  # Default to React if no valid platform specified
+        
+    return {"platforms": platforms}
+
+# Requests mentioning these need real architectural reasoning even when short
+_COMPLEX_KEYWORDS = ("auth", "payment", "realtime", "offline", "sync", "migration")
+
+# Scope Definition Node with Deepseek Reasoner
+async def define_scope_with_reasoner(state: CodeperState, writer):
+    # First, get the documentation pages so the reasoner can decide which ones
+    # are necessary. The prefetch from select_platforms has usually resolved
+    # by now; fall back to fetching directly if it was never started.
+    try:
+        if _docs_prefetch_task is not None:
+            documentation_pages_str = await _docs_prefetch_task
+        else:
+            documentation_pages_str = await get_documentation_pages_cached()
+    except Exception as e:
+        print(f"Error retrieving documentation pages: {str(e)}")
+        documentation_pages_str = "Documentation pages currently unavailable."
+
+    platforms_str = ", ".join(state['platforms'])
+
+    # Then, prepare the prompt for the reasoner
+    prompt = _SCOPE_PROMPT.format_map({
+        "msg": state['latest_user_message'],
+        "platforms": platforms_str,
+        "docs": documentation_pages_str
+    })
+
+    # Short single-platform requests without complexity markers don't need the
+    # multi-second reasoner - the primary model writes an adequate scope
+    message = state['latest_user_message']
+    is_simple = (
+        len(message.split()) < 40
+        and len(state['platforms']) == 1
+        and not any(kw in message.lower() for kw in _COMPLEX_KEYWORDS)
+    )
+
+    if is_simple:
+        async def _scope(p):
+            result = await scope_agent.run(p)
+            return result.data
+
+        scope = await cached_llm_call(prompt, _scope)
+    else:
+        # Call deepseek-reasoner directly with custom handling, streaming the
+        # scope text to the UI as it is generated. Repeat prompts come straight
+        # from the disk cache without a reasoner call.
+        streamed = False
+
+        async def _reason(p):
+            nonlocal streamed
+            streamed = True
+            return await call_deepseek_reasoner(p, writer)
+
+        try:
+            scope = await cached_llm_call(prompt, _reason)
+        except Exception as e:
+            # Keep the node alive on model failure; the error never reaches
+            # the disk cache because cached_llm_call only stores results
+            scope = f"Error generating scope: {str(e)}"
+        if writer and not streamed:
+            # Cache hit - nothing was streamed, so deliver the scope in one piece
+            writer(scope)
+
+    # Save the scope to a file without blocking the event loop; workbench/ is
+    # created once at module import
+    scope_path = os.path.join("workbench", "scope.md")
+    async with aiofiles.open(scope_path, "w", encoding="utf-8") as f:
+        await f.write(scope)
+
+    return {"scope": scope}
+
+# Coding Node with Feedback Handling
+async def coder_agent(state: CodeperState, writer, config):
+    # Prepare dependencies. The semantic embedding cache is namespaced by the
+    # conversation thread so near-duplicate matches never cross sessions.
+    thread_id = (config or {}).get("configurable", {}).get("thread_id", "")
+    deps = AppCoderDeps(
+        supabase=supabase,
+        openai_client=openai_client,  # Use OpenAI client for coding
+        reasoner_output=state['scope'],
+        platforms=state['platforms'],
+        cache_ns=thread_id
+    )
+
+    # Message history is already parsed by the state reducer
+    message_history: list[ModelMessage] = state.get('messages', [])
+
+    # Run the agent in a stream
+    async with app_coder.run_stream(
+        state['latest_user_message'],
+        deps=deps,
+        message_history=message_history
+    ) as result:
+        # Decouple fetching chunks from handing them to the writer: a bounded
+        # queue lets the next-token request proceed while the writer (which
+        # pushes through LangGraph's stream machinery) drains the previous
+        # chunk, instead of strictly alternating the two
+        queue: asyncio.Queue = asyncio.Queue(maxsize=32)
+
+        async def produce():
+            async for chunk in result.stream_text(delta=True):
+                await queue.put(chunk)
+            await queue.put(None)
+
+        async def consume():
+            while (chunk := await queue.get()) is not None:
+                writer(chunk)
+
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            tg.create_task(consume())
+
+    return {"messages": [result.new_messages_json()]}
+
+# Modified implementation to avoid the interrupt error
+def get_next_user_message(state: CodeperState):
+    """
+    This is a placeholder for the interrupt node.
+    In LangGraph, this is a special node that will pause execution
+    and wait for the next user input.
+    
+    The actual interrupt happens in the streamlit_ui.py
+    when it calls codeper_flow.astream with Command(resume=user_input)
+    """
+    # We don't call interrupt() here, as that's handled by the UI
+    # Just return the state as-is
+    return state
+
+# Cheap routing patterns: most turns are trivially classifiable without an
+# LLM round trip. Only ambiguous messages fall through to the router agent.
+_FINISH_RE = re.compile(r"\b(done|finish(ed)?|bye|goodbye|quit|exit|thanks?( a lot)?|thank you|that'?s (it|all)|stop|no more)\b", re.I)
+_CONTINUE_RE = re.compile(r"\b(add|change|also|another|more|next|update|fix|refactor|implement|create|build|make|improve)\b", re.I)
+
+# Determine if the user is finished creating their app or not
+async def route_user_message(state: CodeperState):
+    # Fast local classification first
+    message = state['latest_user_message']
+    if _FINISH_RE.search(message) and not _CONTINUE_RE.search(message):
+        return "finish_conversation"
+    if _CONTINUE_RE.search(message):
+        return "coder_agent"
+    
+    prompt = _ROUTER_PROMPT.format_map({"msg": message})
+
+    async def _route(p):
+        result = await router_agent.run(p)
+        return result.data
+
+    next_action = (await cached_llm_call(prompt, _route)).strip().lower()
+
+    if next_action == "finish_conversation":
+        return "finish_conversation"
+    else:
+        return "coder_agent"
+
+# End of conversation agent to give instructions for executing the app
+async def finish_conversation(state: CodeperState, writer):
+    # Message history is already parsed by the state reducer
+    message_history: list[ModelMessage] = state.get('messages', [])
+
+    platforms_str = ", ".join(state['platforms'])
+    
+    # Custom prompt for the end conversation agent
+    prompt = _FINISH_PROMPT.format_map({
+        "platforms": platforms_str,
+        "msg": state['latest_user_message']
+    })
+
+    # Run the agent in a stream
+    async with end_conversation_agent.run_stream(
+        prompt,
+        message_history=message_history
+    ) as result:
+        # Stream partial text as it arrives
+        async for chunk in result.stream_text(delta=True):
+            writer(chunk)
+
+    return {"messages": [result.new_messages_json()]}        
+
+# Build workflow
+builder = StateGraph(CodeperState)
+
+# Add nodes
+builder.add_node("select_platforms", select_platforms)
+builder.add_node("define_scope_with_reasoner", define_scope_with_reasoner)
+builder.add_node("coder_agent", coder_agent)
+builder.add_node("get_next_user_message", get_next_user_message)
+builder.add_node("finish_conversation", finish_conversation)
+
+# Set edges
+builder.add_edge(START, "select_platforms")
+builder.add_edge("select_platforms", "define_scope_with_reasoner")
+builder.add_edge("define_scope_with_reasoner", "coder_agent")
+builder.add_edge("coder_agent", "get_next_user_message")
+builder.add_conditional_edges(
+    "get_next_user_message",
+    route_user_message,
+    {"coder_agent": "coder_agent", "finish_conversation": "finish_conversation"}
+)
+builder.add_edge("finish_conversation", END)
+
+# Configure persistence. SQLite instead of MemorySaver: checkpoints no longer
+# deep-copy the whole state into RAM on every node transition, and a restart
+# keeps the conversation. The async saver is required because streamlit_ui.py
+# drives the graph through astream(); the sync SqliteSaver raises
+# NotImplementedError from its async checkpoint methods. WAL +
+# synchronous=NORMAL keeps writes fast while staying crash-safe.
+class _TunedAsyncSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver that applies the write-performance pragmas on setup."""
+
+    async def setup(self) -> None:
+        apply_pragmas = not self.is_setup
+        await super().setup()
+        if apply_pragmas:
+            await self.conn.execute("PRAGMA journal_mode=WAL")
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+
+os.makedirs("workbench", exist_ok=True)
+memory = _TunedAsyncSqliteSaver(aiosqlite.connect("workbench/checkpoints.db"))
 codeper_flow = builder.compile(checkpointer=memory)
\ No newline at end of file
@@ -0,0 +1,107 @@
+-- Similarity search setup for the platform documentation tables.
+-- Run this once against your Supabase project (SQL editor or psql) so the
+-- match_<table> functions used by retrieve_relevant_documentation exist.
+
+-- Enable pgvector (no-op if already enabled)
+create extension if not exists vector;
+
+-- Approximate nearest-neighbour indexes for cosine distance.
+-- lists = 100 is a reasonable default for tables up to ~100k rows.
+create index if not exists react_pages_embedding_idx
+    on react_pages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create index if not exists electron_pages_embedding_idx
+    on electron_pages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create index if not exists node_pages_embedding_idx
+    on node_pages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create index if not exists native_script_pages_embedding_idx
+    on native_script_pages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+-- KNN match functions, one per platform table. Each returns the match_count
+-- nearest chunks by cosine distance, with only the columns the agent reads.
+
+create or replace function match_react_pages(
+    query_embedding vector(1536),
+    match_count int default 5
+) returns table (
+    url varchar,
+    chunk_number integer,
+    title varchar,
+    summary varchar,
+    content text,
+    similarity float
+)
+language sql stable
+as $$
+    select
+        url, chunk_number, title, summary, content,
+        1 - (embedding <=> query_embedding) as similarity
+    from react_pages
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;
+
+create or replace function match_electron_pages(
+    query_embedding vector(1536),
+    match_count int default 5
+) returns table (
+    url varchar,
+    chunk_number integer,
+    title varchar,
+    summary varchar,
+    content text,
+    similarity float
+)
+language sql stable
+as $$
+    select
+        url, chunk_number, title, summary, content,
+        1 - (embedding <=> query_embedding) as similarity
+    from electron_pages
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;
+
+create or replace function match_node_pages(
+    query_embedding vector(1536),
+    match_count int default 5
+) returns table (
+    url varchar,
+    chunk_number integer,
+    title varchar,
+    summary varchar,
+    content text,
+    similarity float
+)
+language sql stable
+as $$
+    select
+        url, chunk_number, title, summary, content,
+        1 - (embedding <=> query_embedding) as similarity
+    from node_pages
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;
+
+create or replace function match_native_script_pages(
+    query_embedding vector(1536),
+    match_count int default 5
+) returns table (
+    url varchar,
+    chunk_number integer,
+    title varchar,
+    summary varchar,
+    content text,
+    similarity float
+)
+language sql stable
+as $$
+    select
+        url, chunk_number, title, summary, content,
+        1 - (embedding <=> query_embedding) as similarity
+    from native_script_pages
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;